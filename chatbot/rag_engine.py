@@ -1,12 +1,17 @@
 """
 Simplified RAG (Retrieval-Augmented Generation) Engine for academic papers.
 """
+import functools
 import os
 import json
+import logging
 from typing import List, Dict, Tuple, Optional
 from django.conf import settings
+from django.db import transaction
 from papers.models import Paper, PaperChunk
 
+logger = logging.getLogger(__name__)
+
 
 class RAGEngine:
     """Simplified RAG engine for processing academic papers and answering questions."""
@@ -24,29 +29,29 @@ class RAGEngine:
                 return True
             
             # Extract text content
+            update_fields = ['processed']
             if not paper.content_text:
                 paper.content_text = self._extract_text_from_file(paper.file.path)
-                paper.save()
+                update_fields.append('content_text')
             
             # Split text into chunks
             chunks = self._split_text(paper.content_text)
             
-            # Create chunks
-            for i, chunk_text in enumerate(chunks):
-                PaperChunk.objects.create(
-                    paper=paper,
-                    content=chunk_text,
-                    chunk_index=i
+            # Store chunks and the processed flag in one commit
+            with transaction.atomic():
+                PaperChunk.bulk_create_for_paper(
+                    paper,
+                    [{'content': chunk_text} for chunk_text in chunks]
                 )
-            
-            # Mark paper as processed
-            paper.processed = True
-            paper.save()
+                
+                # Mark paper as processed
+                paper.processed = True
+                paper.save(update_fields=update_fields)
             
             return True
             
-        except Exception as e:
-            print(f"Error processing paper {paper.id}: {e}")
+        except Exception:
+            logger.exception("Error processing paper %s", paper.id)
             return False
     
     def query(self, question: str, paper: Paper) -> Tuple[str, List[Dict], List[Dict]]:
@@ -86,14 +91,14 @@ class RAGEngine:
             return response, formatted_chunks, sources
             
         except Exception as e:
-            print(f"Error in RAG query: {e}")
+            logger.exception("Error in RAG query")
             return f"I encountered an error while processing your question: {str(e)}", [], []
     
     def _get_relevant_chunks_simple(self, question: str, paper: Paper) -> List[PaperChunk]:
         """Get relevant chunks using improved keyword matching."""
         try:
-            # Get all chunks for the paper
-            chunks = paper.chunks.all()
+            # Get all chunks for the paper; scoring is keyword based, so skip the embedding blob
+            chunks = paper.chunks.defer('embedding')
             
             if not chunks.exists():
                 return []
@@ -145,8 +150,8 @@ class RAGEngine:
             
             return relevant_chunks
             
-        except Exception as e:
-            print(f"Error retrieving chunks: {e}")
+        except Exception:
+            logger.exception("Error retrieving chunks")
             return []
     
     def _extract_key_concepts(self, question: str) -> List[str]:
@@ -362,8 +367,8 @@ class RAGEngine:
             else:
                 return ""
                 
-        except Exception as e:
-            print(f"Error extracting text from file: {e}")
+        except Exception:
+            logger.exception("Error extracting text from file %s", file_path)
             return ""
     
     def _extract_text_from_pdf(self, file_path: str) -> str:
@@ -376,8 +381,8 @@ class RAGEngine:
                 for page in pdf_reader.pages:
                     text += page.extract_text() + "\n"
                 return text
-        except Exception as e:
-            print(f"Error extracting PDF text: {e}")
+        except Exception:
+            logger.exception("Error extracting PDF text from %s", file_path)
             return ""
     
     def _extract_text_from_docx(self, file_path: str) -> str:
@@ -389,8 +394,8 @@ class RAGEngine:
             for paragraph in doc.paragraphs:
                 text += paragraph.text + "\n"
             return text
-        except Exception as e:
-            print(f"Error extracting DOCX text: {e}")
+        except Exception:
+            logger.exception("Error extracting DOCX text from %s", file_path)
             return ""
     
     def _extract_text_from_txt(self, file_path: str) -> str:
@@ -398,6 +403,16 @@ class RAGEngine:
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 return file.read()
-        except Exception as e:
-            print(f"Error extracting TXT text: {e}")
+        except Exception:
+            logger.exception("Error extracting TXT text from %s", file_path)
             return ""
+
+
+@functools.lru_cache(maxsize=None)
+def get_rag_engine() -> RAGEngine:
+    """Return the process-wide RAGEngine.
+
+    The engine keeps no per-request state, so views and tasks share one
+    instance instead of building a new one per call.
+    """
+    return RAGEngine()
@@ -19,7 +19,9 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_message_count(self, obj):
-        return obj.messages.count()
+        # List and detail querysets annotate the count; fall back for new objects
+        count = getattr(obj, 'message_total', None)
+        return obj.messages.count() if count is None else count
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -2,14 +2,17 @@
 API views for the chatbot app.
 """
 import json
+import logging
 import time
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from rest_framework.parsers import JSONParser
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.db.models import Count
 from papers.models import Paper, PaperChunk
+from reference_graph.renderers import ORJSONParser
 from .models import Conversation, Message, RAGQuery, PaperHighlight
 from .serializers import (
     ConversationSerializer, 
@@ -17,7 +20,20 @@ from .serializers import (
     RAGQuerySerializer,
     PaperHighlightSerializer
 )
-from .rag_engine import RAGEngine
+from .rag_engine import get_rag_engine
+
+logger = logging.getLogger(__name__)
+
+QUERY_ERROR_RESPONSE = {'error': 'Error processing query'}
+
+
+def _conversations_with_counts():
+    """Conversations with their paper and message count loaded up front."""
+    # The serializer reads paper.title and the count for every row. Aggregate
+    # queries drop Meta.ordering, so the model's ordering is restated.
+    return Conversation.objects.select_related('paper').defer('paper__content_text').annotate(
+        message_total=Count('messages')
+    ).order_by('-updated_at')
 
 
 class ConversationListView(generics.ListCreateAPIView):
@@ -25,16 +41,19 @@ class ConversationListView(generics.ListCreateAPIView):
     serializer_class = ConversationSerializer
     
     def get_queryset(self):
+        queryset = _conversations_with_counts()
         paper_id = self.request.query_params.get('paper_id')
         if paper_id:
-            return Conversation.objects.filter(paper_id=paper_id)
-        return Conversation.objects.all()
+            return queryset.filter(paper_id=paper_id)
+        return queryset
 
 
 class ConversationDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a conversation."""
-    queryset = Conversation.objects.all()
     serializer_class = ConversationSerializer
+    
+    def get_queryset(self):
+        return _conversations_with_counts()
 
 
 class MessageListView(generics.ListCreateAPIView):
@@ -48,7 +67,7 @@ class MessageListView(generics.ListCreateAPIView):
 
 class ChatView(generics.GenericAPIView):
     """Handle chat interactions."""
-    parser_classes = [JSONParser]
+    parser_classes = [ORJSONParser]
     
     def post(self, request, pk):
         conversation = get_object_or_404(Conversation, pk=pk)
@@ -65,7 +84,7 @@ class ChatView(generics.GenericAPIView):
         )
         
         # Process with RAG engine
-        rag_engine = RAGEngine()
+        rag_engine = get_rag_engine()
         start_time = time.time()
         
         try:
@@ -103,16 +122,17 @@ class ChatView(generics.GenericAPIView):
                 'processing_time': processing_time
             })
             
-        except Exception as e:
-            return Response(
-                {'error': f'Error processing query: {str(e)}'}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        except DatabaseError:
+            # Let Django's request handling discard a broken connection
+            raise
+        except Exception:
+            logger.exception("Error processing query in ChatView")
+            return Response(QUERY_ERROR_RESPONSE, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class PaperChatView(generics.GenericAPIView):
     """Handle chat interactions for a specific paper."""
-    parser_classes = [JSONParser]
+    parser_classes = [ORJSONParser]
     
     def post(self, request, paper_id):
         paper = get_object_or_404(Paper, pk=paper_id)
@@ -137,7 +157,7 @@ class PaperChatView(generics.GenericAPIView):
         )
         
         # Process with RAG engine
-        rag_engine = RAGEngine()
+        rag_engine = get_rag_engine()
         start_time = time.time()
         
         try:
@@ -168,11 +188,12 @@ class PaperChatView(generics.GenericAPIView):
                 'highlighting_data': highlighting_data
             })
             
-        except Exception as e:
-            return Response(
-                {'error': f'Error processing query: {str(e)}'}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        except DatabaseError:
+            # Let Django's request handling discard a broken connection
+            raise
+        except Exception:
+            logger.exception("Error processing query in PaperChatView")
+            return Response(QUERY_ERROR_RESPONSE, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def _create_highlights(self, paper, question, answer, relevant_chunks):
         """Create highlights for relevant content in the paper."""
@@ -205,9 +226,9 @@ class PaperChatView(generics.GenericAPIView):
                         highlight_type='relevant',
                         color='#FFD700'
                     )
-        except Exception as e:
+        except Exception:
             # Log error but don't fail the chat
-            print(f"Error creating highlights: {e}")
+            logger.exception("Error creating highlights for paper %s", paper.id)
     
     def _prepare_highlighting_data(self, relevant_chunks):
         """Prepare highlighting data for frontend with improved highlighting."""
@@ -272,10 +293,11 @@ class PaperChatView(generics.GenericAPIView):
         if len(phrases) < 2:
             # Extract key content around important words
             important_words = ['study', 'research', 'found', 'shows', 'demonstrates', 'concludes', 'results', 'method', 'approach']
+            content_lower = content.lower()
             for word in important_words:
-                if word.lower() in content.lower():
+                word_index = content_lower.find(word)
+                if word_index != -1:
                     # Find context around this word
-                    word_index = content.lower().find(word.lower())
                     start = max(0, word_index - 50)
                     end = min(len(content), word_index + len(word) + 50)
                     context = content[start:end].strip()
@@ -299,7 +321,7 @@ class PaperHighlightsView(generics.ListAPIView):
 
 class RAGQueryView(generics.GenericAPIView):
     """Direct RAG query endpoint."""
-    parser_classes = [JSONParser]
+    parser_classes = [ORJSONParser]
     
     def post(self, request):
         paper_id = request.data.get('paper_id')
@@ -312,7 +334,7 @@ class RAGQueryView(generics.GenericAPIView):
             )
         
         paper = get_object_or_404(Paper, pk=paper_id)
-        rag_engine = RAGEngine()
+        rag_engine = get_rag_engine()
         
         try:
             response, relevant_chunks, sources = rag_engine.query(query, paper)
@@ -324,8 +346,9 @@ class RAGQueryView(generics.GenericAPIView):
                 'sources': sources
             })
             
-        except Exception as e:
-            return Response(
-                {'error': f'Error processing query: {str(e)}'}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        except DatabaseError:
+            # Let Django's request handling discard a broken connection
+            raise
+        except Exception:
+            logger.exception("Error processing query in RAGQueryView")
+            return Response(QUERY_ERROR_RESPONSE, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
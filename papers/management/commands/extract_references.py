@@ -3,7 +3,8 @@ Management command to extract references from papers.
 """
 from django.core.management.base import BaseCommand
 from papers.models import Paper
-from papers.utils import extract_references_from_paper
+from papers.tasks import ENQUEUE_BATCH_SIZE, enqueue_in_batches, extract_references_task
+from papers.utils import extract_references_batch, extract_references_from_paper
 
 
 class Command(BaseCommand):
@@ -20,6 +21,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Extract references from all papers',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of papers to process concurrently (default: 1)',
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='run_async',
+            help='Queue papers on the Celery workers instead of processing them here',
+        )
 
     def handle(self, *args, **options):
         if options['paper_id']:
@@ -38,25 +51,50 @@ class Command(BaseCommand):
                 )
         elif options['all']:
             # Process all papers
-            papers = Paper.objects.all()
+            papers = Paper.objects.only('id', 'title')
             self.stdout.write(f'Processing {papers.count()} papers...')
-            
-            for paper in papers:
-                self.stdout.write(f'\nProcessing: {paper.title[:50]}...')
-                success = extract_references_from_paper(str(paper.id))
-                if success:
-                    self.stdout.write(self.style.SUCCESS('  ✓ Completed'))
-                else:
-                    self.stdout.write(self.style.ERROR('  ✗ Failed'))
+            self.run(papers, options)
+        else:
+            # Process papers whose references have not been extracted yet
+            papers = Paper.objects.filter(references_extracted=False).only('id', 'title')
+            self.stdout.write(f'Processing {papers.count()} papers without extracted references...')
+            self.run(papers, options)
+    
+    def run(self, papers, options):
+        if options['run_async']:
+            self.enqueue_papers(papers)
         else:
-            # Process papers without references
-            papers = Paper.objects.filter(references__isnull=True)
-            self.stdout.write(f'Processing {papers.count()} papers without references...')
-            
-            for paper in papers:
+            self.process_papers(papers, options['workers'])
+    
+    def enqueue_papers(self, papers):
+        """Fan the papers out to the Celery workers as one group per batch."""
+        paper_ids = papers.values_list('id', flat=True).iterator(chunk_size=ENQUEUE_BATCH_SIZE)
+        queued = enqueue_in_batches(extract_references_task.s, paper_ids)
+        self.stdout.write(self.style.SUCCESS(f'✓ Queued {queued} papers for reference extraction'))
+    
+    def process_papers(self, papers, workers=1):
+        """Extract references for each paper, optionally across a thread pool."""
+        if workers <= 1:
+            for paper in papers.iterator(chunk_size=500):
                 self.stdout.write(f'\nProcessing: {paper.title[:50]}...')
-                success = extract_references_from_paper(str(paper.id))
-                if success:
-                    self.stdout.write(self.style.SUCCESS('  ✓ Completed'))
-                else:
-                    self.stdout.write(self.style.ERROR('  ✗ Failed'))
+                self.report(extract_references_from_paper(str(paper.id)))
+            return
+        
+        # Titles are kept only for papers in flight, so memory stays bounded
+        titles = {}
+        
+        def paper_ids():
+            for paper in papers.iterator(chunk_size=500):
+                titles[str(paper.id)] = paper.title
+                yield str(paper.id)
+        
+        for paper_id, success in extract_references_batch(paper_ids(), workers):
+            self.stdout.write(f'\nProcessed: {titles.pop(paper_id)[:50]}...')
+            self.report(success)
+    
+    def report(self, success):
+        if success:
+            self.stdout.write(self.style.SUCCESS('  ✓ Completed'))
+        else:
+            self.stdout.write(self.style.ERROR('  ✗ Failed'))
+
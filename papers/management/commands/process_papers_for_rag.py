@@ -3,6 +3,7 @@ Management command to process papers for RAG functionality.
 """
 from django.core.management.base import BaseCommand
 from papers.models import Paper
+from papers.tasks import ENQUEUE_BATCH_SIZE, enqueue_in_batches, process_paper_rag
 from chatbot.rag_engine import RAGEngine
 
 
@@ -25,6 +26,12 @@ class Command(BaseCommand):
             action='store_true',
             help='Force reprocessing even if already processed',
         )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='run_async',
+            help='Queue papers on the Celery workers instead of processing them here',
+        )
 
     def handle(self, *args, **options):
         rag_engine = RAGEngine()
@@ -40,19 +47,36 @@ class Command(BaseCommand):
                 )
         elif options['all']:
             # Process all papers with files
-            papers = Paper.objects.exclude(file='')
+            papers = Paper.objects.exclude(file='').only('id', 'title', 'content_text', 'processed')
             self.stdout.write(f'Processing {papers.count()} papers...')
             
-            for paper in papers:
+            if options['run_async']:
+                self.enqueue_papers(papers, options['force'])
+                return
+            
+            # Stream rows so large corpora don't sit in the queryset cache
+            for paper in papers.iterator(chunk_size=200):
                 self.process_paper(paper, rag_engine, options['force'])
         else:
             # Process papers that haven't been processed yet
-            papers = Paper.objects.exclude(file='').filter(processed=False)
+            papers = Paper.objects.exclude(file='').filter(processed=False).only(
+                'id', 'title', 'content_text', 'processed'
+            )
             self.stdout.write(f'Processing {papers.count()} unprocessed papers...')
             
-            for paper in papers:
+            if options['run_async']:
+                self.enqueue_papers(papers, False)
+                return
+            
+            for paper in papers.iterator(chunk_size=200):
                 self.process_paper(paper, rag_engine, False)
     
+    def enqueue_papers(self, papers, force=False):
+        """Fan the papers out to the Celery workers as one group per batch."""
+        paper_ids = papers.values_list('id', flat=True).iterator(chunk_size=ENQUEUE_BATCH_SIZE)
+        queued = enqueue_in_batches(lambda paper_id: process_paper_rag.s(paper_id, force), paper_ids)
+        self.stdout.write(self.style.SUCCESS(f'✓ Queued {queued} papers for processing'))
+    
     def process_paper(self, paper, rag_engine, force=False):
         """Process a single paper for RAG."""
         try:
@@ -11,7 +11,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         # Get a paper with content
-        paper = Paper.objects.filter(file__isnull=False).first()
+        # The queries only need these columns; content_text loads lazily if processing is needed
+        paper = Paper.objects.filter(file__isnull=False).only('id', 'title', 'author', 'processed').first()
         if not paper:
             self.stdout.write('No papers with content found.')
             return
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-16 01:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Paper = apps.get_model('papers', 'Paper')
+    Reference = apps.get_model('papers', 'Reference')
+
+    def _count(field):
+        return Coalesce(Subquery(
+            Reference.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ), 0)
+
+    Paper.objects.update(
+        reference_count=_count('source_paper'),
+        citation_count=_count('target_paper'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paper',
+            name='citation_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='paper',
+            name='reference_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 01:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0002_paper_reference_citation_counts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paper',
+            index=models.Index(fields=['processed', '-uploaded_at'], name='paper_proc_uploaded_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-16 01:26
+
+from django.db import migrations, models
+
+
+def backfill_references_extracted(apps, schema_editor):
+    Paper = apps.get_model('papers', 'Paper')
+    Paper.objects.filter(reference_count__gt=0).update(references_extracted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0003_paper_processed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paper',
+            name='references_extracted',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.RunPython(backfill_references_extracted, migrations.RunPython.noop),
+    ]
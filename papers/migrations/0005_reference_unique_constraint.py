@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-16 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0004_paper_references_extracted'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='reference',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='reference',
+            constraint=models.UniqueConstraint(fields=('source_paper', 'target_paper'), name='uniq_src_tgt_ref'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0005_reference_unique_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paper',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True),
+        ),
+    ]
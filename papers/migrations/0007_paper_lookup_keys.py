@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-16 01:43
+
+import hashlib
+import re
+
+from django.db import migrations, models
+
+
+# Frozen copy of papers.models.normalize_lookup_text / paper_dedup_key
+_PUNCTUATION_RE = re.compile(r'[^\w\s]+')
+
+
+def _normalize(value):
+    return ' '.join(_PUNCTUATION_RE.sub(' ', (value or '').casefold()).split())
+
+
+def backfill_lookup_keys(apps, schema_editor):
+    Paper = apps.get_model('papers', 'Paper')
+    batch = []
+    for paper in Paper.objects.only('id', 'title', 'author').iterator(chunk_size=500):
+        title_norm = _normalize(paper.title)
+        author_norm = _normalize(paper.author)
+        paper.title_norm = title_norm[:500]
+        paper.author_norm = author_norm[:200]
+        paper.dedup_key = hashlib.sha1(f"{title_norm[:100]}|{author_norm[:50]}".encode('utf-8')).hexdigest()
+        batch.append(paper)
+        if len(batch) >= 500:
+            Paper.objects.bulk_update(batch, ['title_norm', 'author_norm', 'dedup_key'])
+            batch = []
+    if batch:
+        Paper.objects.bulk_update(batch, ['title_norm', 'author_norm', 'dedup_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0006_paper_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paper',
+            name='author_norm',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='paper',
+            name='dedup_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='paper',
+            name='title_norm',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500),
+        ),
+        migrations.RunPython(backfill_lookup_keys, migrations.RunPython.noop),
+    ]
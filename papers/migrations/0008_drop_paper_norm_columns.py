@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-16 02:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0007_paper_lookup_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='paper',
+            name='author_norm',
+        ),
+        migrations.RemoveField(
+            model_name='paper',
+            name='title_norm',
+        ),
+    ]
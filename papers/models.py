@@ -2,11 +2,29 @@
 Models for the papers app.
 """
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
+import hashlib
+import re
 import uuid
 
 
+_PUNCTUATION_RE = re.compile(r'[^\w\s]+')
+
+
+def normalize_lookup_text(value):
+    """Casefold, drop punctuation and collapse whitespace for exact-match lookups."""
+    return ' '.join(_PUNCTUATION_RE.sub(' ', (value or '').casefold()).split())
+
+
+def paper_dedup_key(title, author):
+    """Return the lookup key shared by papers with the same normalized title and author."""
+    key = f"{normalize_lookup_text(title)[:100]}|{normalize_lookup_text(author)[:50]}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
 class Paper(models.Model):
     """Model representing an academic paper."""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -20,6 +38,7 @@ class Paper(models.Model):
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed = models.BooleanField(default=False)
+    references_extracted = models.BooleanField(default=False, db_index=True)
     content_text = models.TextField(blank=True, null=True)
     
     # Metadata
@@ -28,21 +47,58 @@ class Paper(models.Model):
     year = models.IntegerField(blank=True, null=True)
     keywords = models.TextField(blank=True, null=True)
     
+    # BLAKE2b digest of the downloaded PDF, used to reuse files already stored
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True, editable=False)
+    
+    # Denormalized counts, kept in sync by the Reference signals in papers.signals
+    reference_count = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+    citation_count = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+    
+    # Hash of the normalized title and author, so references can be matched to
+    # existing papers with an indexed equality lookup; set in save()
+    dedup_key = models.CharField(max_length=40, blank=True, default='', db_index=True, editable=False)
+    
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Serves both processed=... filters and the default ordering within them
+            models.Index(fields=['processed', '-uploaded_at'], name='paper_proc_uploaded_idx'),
+        ]
         
     def __str__(self):
         return f"{self.title} by {self.author}"
     
-    @property
-    def reference_count(self):
-        """Return the number of references this paper has."""
-        return self.references.count()
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.set_lookup_keys()
+        elif {'title', 'author'} & set(update_fields):
+            self.set_lookup_keys()
+            kwargs['update_fields'] = {*update_fields, 'dedup_key'}
+        # Otherwise neither field is written, so the key can't change; skipping
+        # them also avoids loading a deferred title or author
+        super().save(*args, **kwargs)
+    
+    def set_lookup_keys(self):
+        """Fill dedup_key; bulk_create callers must call this."""
+        self.dedup_key = paper_dedup_key(self.title, self.author)
     
-    @property
-    def citation_count(self):
-        """Return the number of papers that cite this paper."""
-        return self.cited_by.count()
+    @classmethod
+    def refresh_counts(cls, paper_ids):
+        """Recompute reference_count and citation_count for the given papers."""
+        def _count(field):
+            return Coalesce(Subquery(
+                Reference.objects.filter(**{field: OuterRef('pk')})
+                .order_by()
+                .values(field)
+                .annotate(total=Count('pk'))
+                .values('total')
+            ), 0)
+        
+        cls.objects.filter(pk__in=paper_ids).update(
+            reference_count=_count('source_paper'),
+            citation_count=_count('target_paper'),
+        )
 
 
 class Reference(models.Model):
@@ -61,7 +117,9 @@ class Reference(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        unique_together = ['source_paper', 'target_paper']
+        constraints = [
+            models.UniqueConstraint(fields=['source_paper', 'target_paper'], name='uniq_src_tgt_ref'),
+        ]
         ordering = ['-created_at']
     
     def __str__(self):
@@ -84,6 +142,28 @@ class PaperChunk(models.Model):
     
     def __str__(self):
         return f"Chunk {self.chunk_index} of {self.paper.title}"
+    
+    @classmethod
+    def bulk_create_for_paper(cls, paper, rows, batch_size=500):
+        """
+        Create all chunks for a paper in multi-row INSERTs.
+        
+        Each row is a dict with 'content' and optional 'page', 'section' and
+        'embedding' keys; chunk_index follows the order of rows. This is the
+        supported way to store chunks, rather than one create() per chunk.
+        """
+        objs = [
+            cls(
+                paper=paper,
+                chunk_index=i,
+                content=row['content'],
+                page_number=row.get('page'),
+                section=row.get('section'),
+                embedding=row.get('embedding'),
+            )
+            for i, row in enumerate(rows)
+        ]
+        return cls.objects.bulk_create(objs, batch_size=batch_size, ignore_conflicts=True)
 
 
 class PaperMetadata(models.Model):
@@ -0,0 +1,66 @@
+"""
+Signal handlers for the papers app.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Paper, Reference
+from .utils import bump_graph_version
+
+
+@receiver(pre_save, sender=Reference)
+def remember_reference_endpoints(sender, instance, update_fields=None, **kwargs):
+    """Remember the papers an existing reference pointed at before it is edited.
+
+    Only looked up when the save may move the reference: a full save, or
+    update_fields naming source_paper or target_paper.
+    """
+    if update_fields is not None and not {
+        'source_paper', 'source_paper_id', 'target_paper', 'target_paper_id'
+    } & set(update_fields):
+        instance._previous_endpoints = ()
+        return
+    if instance.pk:
+        instance._previous_endpoints = tuple(
+            Reference.objects.filter(pk=instance.pk)
+            .values_list('source_paper_id', 'target_paper_id')
+            .first() or ()
+        )
+
+
+@receiver(post_save, sender=Reference)
+def update_counts_on_save(sender, instance, created, **kwargs):
+    """Keep the denormalized counts on both papers in step with the reference."""
+    if created:
+        Paper.objects.filter(pk=instance.source_paper_id).update(
+            reference_count=F('reference_count') + 1
+        )
+        Paper.objects.filter(pk=instance.target_paper_id).update(
+            citation_count=F('citation_count') + 1
+        )
+        return
+    
+    # An edited reference may have moved, so recount every paper it touched
+    endpoints = {instance.source_paper_id, instance.target_paper_id}
+    endpoints.update(getattr(instance, '_previous_endpoints', ()))
+    Paper.refresh_counts(endpoints)
+
+
+@receiver(post_delete, sender=Reference)
+def update_counts_on_delete(sender, instance, **kwargs):
+    """Decrement the denormalized counts when a reference is removed."""
+    Paper.objects.filter(pk=instance.source_paper_id, reference_count__gt=0).update(
+        reference_count=F('reference_count') - 1
+    )
+    Paper.objects.filter(pk=instance.target_paper_id, citation_count__gt=0).update(
+        citation_count=F('citation_count') - 1
+    )
+
+
+@receiver([post_save, post_delete], sender=Paper)
+@receiver([post_save, post_delete], sender=Reference)
+def invalidate_graph_cache(sender, **kwargs):
+    """Any change to papers or references makes cached graph payloads stale."""
+    # Wait for the commit, so a rebuild in between can't cache the old graph
+    transaction.on_commit(bump_graph_version)
@@ -0,0 +1,106 @@
+"""
+Celery tasks for the papers app.
+"""
+import logging
+from typing import Callable, Iterable
+from celery import chain, group, shared_task
+from .models import Paper
+from .utils import ensure_paper_content_via_online_sources, extract_references_from_paper, get_graph_payload
+
+logger = logging.getLogger(__name__)
+
+
+class PaperProcessingError(Exception):
+    """A processing step reported failure; raised so Celery retries the task."""
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3, acks_late=True)
+def process_paper_rag(paper_id: str, force: bool = False) -> bool:
+    """Extract a single paper's text if needed and chunk it for RAG."""
+    from chatbot.rag_engine import get_rag_engine
+
+    try:
+        paper = Paper.objects.only('id', 'title', 'file', 'content_text', 'processed').get(id=paper_id)
+    except Paper.DoesNotExist:
+        logger.warning("Paper %s no longer exists, skipping RAG processing", paper_id)
+        return False
+
+    if paper.processed and not force:
+        return True
+
+    if not paper.content_text and not paper.file:
+        logger.info("Paper %s has no content text or file, skipping RAG processing", paper_id)
+        return False
+
+    # process_paper logs and swallows its errors, so turn a failure back into one
+    if not get_rag_engine().process_paper(paper):
+        raise PaperProcessingError(f"RAG processing failed for paper {paper_id}")
+    return True
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3, acks_late=True)
+def extract_references_task(paper_id: str) -> bool:
+    """Extract references from a single paper."""
+    if not extract_references_from_paper(paper_id):
+        raise PaperProcessingError(f"Reference extraction failed for paper {paper_id}")
+    return True
+
+
+@shared_task(bind=True, rate_limit='10/m', acks_late=True)
+def fetch_paper_content_task(self, paper_id: str) -> bool:
+    """Find, download and process an online PDF for a paper with no content."""
+    return ensure_paper_content_via_online_sources(paper_id)
+
+
+@shared_task(ignore_result=True)
+def update_reference_graph() -> None:
+    """Rebuild the cached graph payload, so viewers rarely wait for a build.
+
+    Run hourly by beat, which also keeps the current payload from expiring.
+    """
+    get_graph_payload(rebuild=True)
+
+
+def process_and_extract_references(paper_id: str):
+    """Queue text extraction and chunking, then reference extraction, for a paper.
+
+    Both steps run on the workers as a chain, so the caller returns at once.
+    Reference extraction runs after chunking succeeds or is skipped for lack
+    of content. A chunking failure is retried, and if it keeps failing the
+    chain stops there.
+
+    Queueing errors, such as the broker being down, are logged rather than
+    raised, so an upload that already saved its paper still succeeds; the
+    result is None then.
+    """
+    try:
+        return chain(
+            process_paper_rag.si(paper_id),
+            extract_references_task.si(paper_id),
+        ).apply_async()
+    except Exception:
+        logger.exception("Could not queue processing for paper %s", paper_id)
+        return None
+
+
+# Signatures sent to the broker per group when fanning papers out
+ENQUEUE_BATCH_SIZE = 200
+
+
+def enqueue_in_batches(make_signature: Callable, paper_ids: Iterable) -> int:
+    """Queue make_signature(paper_id) for every id, one group per batch.
+
+    Returns the number of papers queued.
+    """
+    batch = []
+    queued = 0
+    for paper_id in paper_ids:
+        batch.append(make_signature(str(paper_id)))
+        if len(batch) == ENQUEUE_BATCH_SIZE:
+            group(batch).apply_async()
+            queued += len(batch)
+            batch = []
+    if batch:
+        group(batch).apply_async()
+        queued += len(batch)
+    return queued
@@ -1,333 +1,706 @@
 """
 Utility functions for the papers app.
 """
+import functools
+import hashlib
+import itertools
 import os
 import re
 import json
+import logging
 import time
 import urllib.parse
+import xml.etree.ElementTree as ET
+import orjson
 import requests
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 from django.conf import settings
-from django.core.files.base import ContentFile
-from .models import Paper, Reference, PaperMetadata
-from chatbot.rag_engine import RAGEngine
-from django.db import models
-from bs4 import BeautifulSoup
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils import timezone
+from .models import Paper, Reference, PaperMetadata, paper_dedup_key
+from chatbot.rag_engine import get_rag_engine
+from django.db import close_old_connections, connection, models, transaction
+from bs4 import BeautifulSoup, SoupStrainer
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
 
 
 def extract_references_from_paper(paper_id: str) -> bool:
     """Extract references from a paper and create reference relationships."""
     try:
         paper = Paper.objects.get(id=paper_id)
-        print(f"Processing paper: {paper.title[:50]}...")
+        logger.info("Extracting references from paper %s (%s)", paper.id, paper.title[:50])
         
         # Extract text content if not already done
         if not paper.content_text:
-            print("  - Extracting text content...")
-            rag_engine = RAGEngine()
-            rag_engine.process_paper(paper)
+            logger.debug("Extracting text content for paper %s", paper.id)
+            get_rag_engine().process_paper(paper)
         
         # Extract references from text
-        references = _extract_references_from_text(paper.content_text)
-        print(f"  - Found {len(references)} potential references")
+        references = _cached_references_from_text(paper.content_text)
+        logger.debug("Found %d potential references in paper %s", len(references), paper.id)
+        
+        # Resolve references to stored papers: exact lookup-key matches come
+        # from one query, the rest from the fuzzy lookup
+        keys = [paper_dedup_key(ref_data['title'], ref_data['author']) for ref_data in references]
+        known = _papers_by_dedup_key(keys)
+        targets = []
+        misses = []
+        for key, ref_data in zip(keys, references):
+            referenced_paper = known.get(key)
+            if referenced_paper is None:
+                try:
+                    referenced_paper = _find_similar_paper(ref_data)
+                except Exception:
+                    logger.exception("Error finding referenced paper for %r", ref_data['title'][:50])
+                    continue
+            if referenced_paper is None:
+                misses.append((key, ref_data))
+            else:
+                targets.append((referenced_paper, ref_data))
         
-        # Create or find referenced papers
-        created_count = 0
-        for ref_data in references:
-            referenced_paper = _find_or_create_referenced_paper(ref_data)
-            if referenced_paper:
-                # Create reference relationship
-                ref_obj, created = Reference.objects.get_or_create(
-                    source_paper=paper,
-                    target_paper=referenced_paper,
-                    defaults={'reference_text': ref_data.get('text', '')}
-                )
-                if created:
-                    created_count += 1
+        # Look the misses up on CrossRef/arXiv concurrently; those calls only
+        # wait on HTTP. Whatever is still unknown gets a placeholder paper.
+        # New papers are saved below in one batch with the references
+        with ThreadPoolExecutor(max_workers=EXTERNAL_LOOKUP_WORKERS) as executor:
+            found = list(executor.map(_search_external_reference, [ref_data for _, ref_data in misses]))
+        new_papers = {}
+        for (key, ref_data), fields in zip(misses, found):
+            if fields:
+                key = paper_dedup_key(fields['title'], fields['author'])
+            referenced_paper = new_papers.get(key)
+            if referenced_paper is None:
+                referenced_paper = new_papers[key] = Paper(processed=False, **(fields or {
+                    'title': ref_data['title'][:500],  # Limit title length
+                    'author': ref_data['author'][:200],  # Limit author length
+                    'year': ref_data['year'],
+                }))
+            targets.append((referenced_paper, ref_data))
         
-        print(f"  - Created {created_count} reference relationships")
+        created_count = _create_reference_links(paper, targets, new_papers.values())
+        
+        logger.info("Created %d reference relationships for paper %s", created_count, paper.id)
         
         # Update paper metadata
         _update_paper_metadata(paper)
         
+        # Record completion so reruns can skip this paper. A year found in
+        # the title, when the paper has none, goes in the same UPDATE.
+        updates = {'references_extracted': True}
+        if not paper.year:
+            year_match = _YEAR_RE.search(paper.title)
+            if year_match:
+                updates['year'] = int(year_match.group(0))
+        Paper.objects.filter(pk=paper.pk).update(**updates)
+        for field, value in updates.items():
+            setattr(paper, field, value)
+        
         return True
         
-    except Exception as e:
-        print(f"Error extracting references from paper {paper_id}: {e}")
+    except Exception:
+        logger.exception("Error extracting references from paper %s", paper_id)
         return False
 
 
+# Paper ids submitted per worker thread ahead of the ones finishing
+EXTRACT_BATCH_WINDOW = 4
+
+
+def extract_references_batch(paper_ids: Iterable[str], workers: int = 8) -> Iterator[Tuple[str, bool]]:
+    """Extract references for several papers on a thread pool.
+
+    Extraction mostly waits on HTTP lookups, so threads overlap that waiting.
+    Each worker thread holds its own DB connection, so keep workers modest.
+    Ids are read lazily, a few per worker ahead, so a long iterator is never
+    held in memory; (paper_id, success) pairs are yielded as papers finish.
+    """
+    paper_ids = iter(paper_ids)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {
+            executor.submit(_extract_references_in_thread, paper_id): paper_id
+            for paper_id in itertools.islice(paper_ids, workers * EXTRACT_BATCH_WINDOW)
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                paper_id = pending.pop(future)
+                # Top the window back up before handing the result out
+                for next_id in itertools.islice(paper_ids, 1):
+                    pending[executor.submit(_extract_references_in_thread, next_id)] = next_id
+                yield paper_id, future.result()
+
+
+def _extract_references_in_thread(paper_id: str) -> bool:
+    close_old_connections()
+    try:
+        return extract_references_from_paper(paper_id)
+    finally:
+        # Worker threads don't go through the request cycle that closes connections
+        connection.close()
+
+
+# Improved reference patterns. Titles are read through a lookahead so a long
+# title can't swallow the next citation, and are capped at 300 characters so
+# a missing sentence terminator can't drag a match across the whole document.
+# Names start on a word boundary and are capped at 41 letters, so a long run
+# of letters (e.g. an unspaced PDF text layer) is not rescanned from every
+# position.
+_REF_PATTERNS = [
+    # Pattern 1: Author et al. (Year) Title
+    r'\b([A-Z][a-z]{1,40}(?:\s+et\s+al\.)?)\s*\((\d{4})\)(?=\s*([^.!?]{1,300}[.!?]))',
+    
+    # Pattern 2: Author, A. (Year) Title
+    r'\b([A-Z][a-z]{1,40},\s*[A-Z]\.)\s*\((\d{4})\)(?=\s*([^.!?]{1,300}[.!?]))',
+    
+    # Pattern 3: Author, A. and Author, B. (Year) Title
+    r'\b([A-Z][a-z]{1,40},\s*[A-Z]\.\s+and\s+[A-Z][a-z]{1,40},\s*[A-Z]\.)\s*\((\d{4})\)(?=\s*([^.!?]{1,300}[.!?]))',
+    
+    # Pattern 4: Author et al. (Year). Title
+    r'\b([A-Z][a-z]{1,40}(?:\s+et\s+al\.)?)\s*\((\d{4})\)\.(?=\s*([^.!?]{1,300}[.!?]))',
+    
+    # Pattern 5: Author et al., Year - comma format
+    r'\b([A-Z][a-z]{1,40}(?:\s+et\s+al\.)?),\s*(\d{4})(?=\s*([^.!?]{1,300}[.!?]))',
+    
+    # Pattern 6: Author (Year) - simple format
+    r'\b([A-Z][a-z]{1,40}(?:\s+et\s+al\.)?)\s*\((\d{4})\)',
+    
+    # Pattern 7: Author, A. B. (Year) - initials
+    r'\b([A-Z][a-z]{1,40},\s*[A-Z]\.[\sA-Z\.]{0,20})\s*\((\d{4})\)(?=\s*([^.!?]{1,300}[.!?]))',
+    
+    # Pattern 8: Author & Author (Year) - ampersand format; at most five
+    # names, so the author list fits in the scan window before the year
+    r'\b([A-Z][a-z]{1,40}(?:\s+&\s+[A-Z][a-z]{1,40}){0,4})\s*\((\d{4})\)(?=\s*([^.!?]{1,300}[.!?]))',
+]
+
+# All patterns fused into one alternation so the text is scanned once.
+# Each alternative is wrapped in a named group p0..p7; its own author/year/
+# title groups follow that group's index. _REF_GROUPS maps each name to that
+# index and whether the pattern captures a title.
+_REF_UNION = re.compile(
+    '|'.join(f'(?P<p{i}>{pattern})' for i, pattern in enumerate(_REF_PATTERNS)),
+    re.IGNORECASE,
+)
+_REF_GROUPS = {
+    f'p{i}': (_REF_UNION.groupindex[f'p{i}'], re.compile(pattern).groups > 2)
+    for i, pattern in enumerate(_REF_PATTERNS)
+}
+
+
+# Every pattern has its year right after "(" or ", ", so only the text around
+# such anchors needs scanning: names start within _ANCHOR_BEFORE characters
+# before the year and titles end within _ANCHOR_AFTER after it. In typical
+# papers that is about a quarter of the text.
+_YEAR_ANCHOR_RE = re.compile(r'[(,]\s*\d{4}')
+_ANCHOR_BEFORE = 250
+_ANCHOR_AFTER = 400
+
+
+def _iter_reference_matches(text: str):
+    """Yield _REF_UNION matches, scanning only the windows around year anchors.
+
+    Overlapping windows are merged, and each is scanned with finditer's
+    pos/endpos so match offsets stay relative to the whole text. Names and
+    titles are bounded to fit the windows, but whitespace runs are not, so
+    a citation padded with unusually long whitespace can be cut at a window
+    edge where a full scan would match it whole.
+    """
+    def _windows():
+        start = end = None
+        for anchor in _YEAR_ANCHOR_RE.finditer(text):
+            window_start = max(0, anchor.start() - _ANCHOR_BEFORE)
+            window_end = anchor.end() + _ANCHOR_AFTER
+            if end is not None and window_start <= end:
+                end = window_end
+                continue
+            if end is not None:
+                yield start, end
+            start, end = window_start, window_end
+        if end is not None:
+            yield start, end
+    
+    scanned_to = 0
+    for start, end in _windows():
+        # Never rescan text a previous match already consumed
+        for match in _REF_UNION.finditer(text, max(start, scanned_to), end):
+            scanned_to = match.end()
+            yield match
+
+
+# Longest text scanned for references; anything beyond is ignored
+MAX_REFERENCE_TEXT_CHARS = 5_000_000
+
+
 def _extract_references_from_text(text: str) -> List[Dict]:
     """Extract reference information from paper text with improved patterns."""
-    references = []
+    if len(text) > MAX_REFERENCE_TEXT_CHARS:
+        # Keep the end of the text, where the reference list is
+        logger.warning(
+            "Text is %d characters; scanning only the last %d for references",
+            len(text), MAX_REFERENCE_TEXT_CHARS
+        )
+        text = text[-MAX_REFERENCE_TEXT_CHARS:]
     
-    # Improved reference patterns
-    patterns = [
-        # Pattern 1: Author et al. (Year) Title
-        r'([A-Z][a-z]+(?:\s+et\s+al\.)?)\s*\((\d{4})\)\s*([^.!?]+[.!?])',
-        
-        # Pattern 2: Author, A. (Year) Title
-        r'([A-Z][a-z]+,\s*[A-Z]\.)\s*\((\d{4})\)\s*([^.!?]+[.!?])',
-        
-        # Pattern 3: Author, A. and Author, B. (Year) Title
-        r'([A-Z][a-z]+,\s*[A-Z]\.\s+and\s+[A-Z][a-z]+,\s*[A-Z]\.)\s*\((\d{4})\)\s*([^.!?]+[.!?])',
-        
-        # Pattern 4: Author et al. (Year). Title
-        r'([A-Z][a-z]+(?:\s+et\s+al\.)?)\s*\((\d{4})\)\.\s*([^.!?]+[.!?])',
-        
-        # Pattern 5: Author et al., Year - comma format
-        r'([A-Z][a-z]+(?:\s+et\s+al\.)?),\s*(\d{4})\s*([^.!?]+[.!?])',
-        
-        # Pattern 6: Author (Year) - simple format
-        r'([A-Z][a-z]+(?:\s+et\s+al\.)?)\s*\((\d{4})\)',
+    # Keyed on author and year, so duplicates are dropped as they are found
+    references = {}
+    
+    for match in _iter_reference_matches(text):
+        offset, has_title = _REF_GROUPS[match.lastgroup]
+        author = match.group(offset + 1).strip()
+        # The patterns only accept four digits here, so this always parses
+        year = int(match.group(offset + 2))
         
-        # Pattern 7: Author, A. B. (Year) - initials
-        r'([A-Z][a-z]+,\s*[A-Z]\.[\sA-Z\.]*)\s*\((\d{4})\)\s*([^.!?]+[.!?])',
+        # Basic validation
+        if not (1900 < year < 2030 and len(author) > 3):
+            continue
         
-        # Pattern 8: Author & Author (Year) - ampersand format
-        r'([A-Z][a-z]+(?:\s+&\s+[A-Z][a-z]+)*)\s*\((\d{4})\)\s*([^.!?]+[.!?])',
-    ]
+        key = (author.casefold(), year)
+        if key not in references:
+            references[key] = {
+                'author': author,
+                'year': year,
+                'title': match.group(offset + 3).strip() if has_title else "",
+                'text': text[match.start():match.end(offset + 3) if has_title else match.end()]
+            }
     
-    for pattern in patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            try:
-                author = match.group(1).strip()
-                year = match.group(2).strip()
-                title = match.group(3).strip() if len(match.groups()) > 2 else ""
-                
-                # Basic validation
-                if (len(author) > 3 and 
-                    year.isdigit() and 
-                    len(year) == 4 and 
-                    1900 < int(year) < 2030):
-                    
-                    references.append({
-                        'author': author,
-                        'year': int(year),
-                        'title': title,
-                        'text': match.group(0)
-                    })
-            except (IndexError, ValueError):
-                # Skip malformed matches
-                continue
-    
-    # Remove duplicates based on author and year
-    unique_refs = []
-    seen = set()
-    for ref in references:
-        key = (ref['author'].lower(), ref['year'])
-        if key not in seen:
-            seen.add(key)
-            unique_refs.append(ref)
-    
-    return unique_refs
+    return list(references.values())
+
 
+# How long parsed references are kept for text that has already been scanned
+REFERENCE_PARSE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _cached_references_from_text(text: str) -> List[Dict]:
+    """Return the references in a text, reusing the parse of identical text.
+
+    Task retries, manual re-runs and duplicate uploads hand over the same text
+    again; keying on a hash of the full text skips the regex scan for them.
+    Matching the results to stored papers still happens on every call.
+    """
+    key = 'paper-references:' + hashlib.sha1(text.encode('utf-8')).hexdigest()
+    return cache.get_or_set(key, lambda: _extract_references_from_text(text), REFERENCE_PARSE_CACHE_TIMEOUT)
 
-def _find_or_create_referenced_paper(ref_data: Dict) -> Optional[Paper]:
-    """Find or create a referenced paper."""
+
+@functools.lru_cache(maxsize=4096)
+def _lookup_paper_id(title_key: str, author_key: str):
+    """Return the id of a stored paper matching a reference's title and author.
+
+    Only hits are memoised: a miss raises Paper.DoesNotExist, so a placeholder
+    created for the reference is found by the next lookup.
+    """
+    paper_id = Paper.objects.filter(
+        title__icontains=title_key,
+        author__icontains=author_key
+    ).values_list('id', flat=True).first()
+    if paper_id is None:
+        raise Paper.DoesNotExist
+    return paper_id
+
+
+def _papers_by_dedup_key(keys: List[str]) -> Dict[str, Paper]:
+    """Map lookup keys to a stored paper having that key, in one query.
+
+    An exact key match catches the common case of a work cited again after
+    a placeholder was made for it.
+    """
+    papers = {}
+    for paper in Paper.objects.filter(dedup_key__in=set(keys)).only('id', 'dedup_key'):
+        papers.setdefault(paper.dedup_key, paper)
+    return papers
+
+
+def _find_similar_paper(ref_data: Dict) -> Optional[Paper]:
+    """Find a stored paper whose title and author contain the reference's."""
+    # Use the first 100/50 chars for matching; icontains is case-insensitive
+    title_key = ref_data['title'][:100].lower()
+    author_key = ref_data['author'][:50].lower()
     try:
-        # Try to find existing paper
-        existing_paper = Paper.objects.filter(
-            title__icontains=ref_data['title'][:100],  # Use first 100 chars for matching
-            author__icontains=ref_data['author'][:50]   # Use first 50 chars for matching
-        ).first()
-        
-        if existing_paper:
-            return existing_paper
-        
-        # Try to find paper using external APIs (e.g., arXiv, CrossRef)
-        external_paper = _search_external_paper(ref_data)
-        if external_paper:
-            return external_paper
-        
-        # Create placeholder paper if not found
-        return Paper.objects.create(
-            title=ref_data['title'][:500],  # Limit title length
-            author=ref_data['author'][:200],  # Limit author length
-            year=ref_data['year'],
-            processed=False
-        )
-        
-    except Exception as e:
-        print(f"Error finding/creating referenced paper: {e}")
+        paper_id = _lookup_paper_id(title_key, author_key)
+    except Paper.DoesNotExist:
         return None
+    paper = Paper.objects.filter(pk=paper_id).only('id').first()
+    if paper is None:
+        # The cached paper has since been deleted
+        _lookup_paper_id.cache_clear()
+        return _find_similar_paper(ref_data)
+    return paper
 
 
-def _search_external_paper(ref_data: Dict) -> Optional[Paper]:
-    """Search for paper using external APIs."""
-    try:
-        # Try CrossRef API
-        crossref_url = "https://api.crossref.org/works"
-        params = {
-            'query': f"{ref_data['title']} {ref_data['author']}",
-            'rows': 1
-        }
-        
-        response = requests.get(crossref_url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('message', {}).get('items'):
-                item = data['message']['items'][0]
-                
-                # Extract information
-                title = item.get('title', [''])[0] if item.get('title') else ref_data['title']
-                authors = item.get('author', [])
-                author = ', '.join([f"{a.get('given', '')} {a.get('family', '')}".strip() 
-                                  for a in authors]) if authors else ref_data['author']
-                year = item.get('published-print', {}).get('date-parts', [[None]])[0][0] or ref_data['year']
-                doi = item.get('DOI', '')
-                journal = item.get('container-title', [''])[0] if item.get('container-title') else ''
-                
-                # Create paper
-                return Paper.objects.create(
-                    title=title[:500],
-                    author=author[:200],
-                    year=year,
-                    doi=doi,
-                    journal=journal,
-                    processed=False
-                )
+def _create_reference_links(paper: Paper, targets, new_papers) -> int:
+    """Save new referenced papers and reference rows in batches.
+
+    Returns the number of new references. bulk_create skips the signals that
+    maintain the denormalized counts, so those are recomputed afterwards.
+    """
+    new_papers = list(new_papers)
+    for new_paper in new_papers:
+        # bulk_create bypasses Paper.save(), which normally fills these
+        new_paper.set_lookup_keys()
+    
+    with transaction.atomic():
+        Paper.objects.bulk_create(new_papers, batch_size=500)
         
-        # Try arXiv API
-        arxiv_url = "http://export.arxiv.org/api/query"
-        params = {
-            'search_query': f"ti:{ref_data['title']}",
-            'max_results': 1
-        }
+        # One reference per target; keep the first text seen for it
+        texts = {}
+        for referenced_paper, ref_data in targets:
+            texts.setdefault(referenced_paper.pk, ref_data.get('text', ''))
+        already_linked = set(
+            paper.references.filter(target_paper_id__in=list(texts))
+            .values_list('target_paper_id', flat=True)
+        )
+        new_refs = [
+            Reference(source_paper=paper, target_paper_id=target_id, reference_text=text)
+            for target_id, text in texts.items()
+            if target_id not in already_linked
+        ]
+        Reference.objects.bulk_create(new_refs, ignore_conflicts=True, batch_size=500)
         
-        response = requests.get(arxiv_url, params=params, timeout=10)
-        if response.status_code == 200:
-            # Parse arXiv XML response (simplified)
-            if 'entry' in response.text:
-                # Extract basic info from XML
-                title_match = re.search(r'<title>(.*?)</title>', response.text)
-                author_match = re.search(r'<name>(.*?)</name>', response.text)
-                
-                if title_match and author_match:
-                    title = title_match.group(1).strip()
-                    author = author_match.group(1).strip()
-                    
-                    return Paper.objects.create(
-                        title=title[:500],
-                        author=author[:200],
-                        year=ref_data['year'],
-                        processed=False
-                    )
+        Paper.refresh_counts([paper.pk, *(ref.target_paper_id for ref in new_refs)])
         
-        return None
+        if new_papers or new_refs:
+            # bulk_create sends no signals, so invalidate the graph here
+            transaction.on_commit(bump_graph_version)
+    
+    return len(new_refs)
+
+
+# Unresolved references looked up on external APIs at once, per paper
+EXTERNAL_LOOKUP_WORKERS = 8
+
+
+def _search_external_reference(ref_data: Dict) -> Optional[Dict]:
+    """Search external APIs for a reference, returning Paper field values.
+
+    Makes no database queries, so it can run on worker threads. Outcomes,
+    including misses, are cached by normalized title, author and year, since
+    the same works are cited across many papers. Errors are not cached.
+    """
+    key = f"external-ref:{paper_dedup_key(ref_data['title'], ref_data['author'])}:{ref_data['year']}"
+    cached = cache.get(key)
+    if cached is not None:
+        # A miss is stored as an empty dict
+        return cached or None
+
+    try:
+        # CrossRef and arXiv are queried side by side; CrossRef wins when both match
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            crossref_future = executor.submit(_search_crossref_reference, ref_data)
+            arxiv_future = executor.submit(_search_arxiv_reference, ref_data)
+            result = crossref_future.result() or arxiv_future.result()
         
-    except Exception as e:
-        print(f"Error searching external APIs: {e}")
+    except Exception:
+        logger.warning("Error searching external APIs for %r", ref_data['title'][:50], exc_info=True)
         return None
 
+    cache.set(key, result or {}, settings.EXTERNAL_API_CACHE_TIMEOUT)
+    return result
+
+
+# CrossRef relevance score below which the top hit is treated as no match
+CROSSREF_MIN_SCORE = 80
+
+
+def _search_crossref_reference(ref_data: Dict) -> Optional[Dict]:
+    """Look a reference up on CrossRef, returning Paper field values."""
+    crossref_url = "https://api.crossref.org/works"
+    params = {
+        # Whitespace is collapsed so line-wrapped variants share a cache entry
+        'query': ' '.join(f"{ref_data['title']} {ref_data['author']}".split()),
+        'rows': 1,
+        # Only the fields read below
+        'select': 'DOI,title,author,published-print,container-title,score',
+    }
+    
+    content = _cached_api_get(crossref_url, params=params, timeout=10)
+    if content:
+        data = orjson.loads(content)
+        if data.get('message', {}).get('items'):
+            item = data['message']['items'][0]
+            # Free-text search always returns something; skip weak matches
+            if (item.get('score') or 0) < CROSSREF_MIN_SCORE:
+                return None
+            
+            # Extract information
+            title = item.get('title', [''])[0] if item.get('title') else ref_data['title']
+            authors = item.get('author', [])
+            author = ', '.join([f"{a.get('given', '')} {a.get('family', '')}".strip() 
+                              for a in authors]) if authors else ref_data['author']
+            year = item.get('published-print', {}).get('date-parts', [[None]])[0][0] or ref_data['year']
+            doi = item.get('DOI', '')
+            journal = item.get('container-title', [''])[0] if item.get('container-title') else ''
+            
+            return {
+                'title': title[:500],
+                'author': author[:200],
+                'year': year,
+                'doi': doi,
+                'journal': journal,
+            }
+    return None
+
+
+def _search_arxiv_reference(ref_data: Dict) -> Optional[Dict]:
+    """Look a reference up on arXiv by title, returning Paper field values."""
+    arxiv_url = "http://export.arxiv.org/api/query"
+    params = {
+        'search_query': 'ti:' + ' '.join(ref_data['title'].split()),
+        'max_results': 1
+    }
+    
+    content = _cached_api_get(arxiv_url, params=params, timeout=10)
+    if content:
+        entry = _parse_arxiv_first_entry(content)
+        if entry is not None:
+            # Titles in the feed are wrapped across lines
+            title = ' '.join(entry.findtext('atom:title', default='', namespaces=_ATOM_NS).split())
+            author = entry.findtext('atom:author/atom:name', default='', namespaces=_ATOM_NS).strip()
+            
+            if title and author:
+                return {
+                    'title': title[:500],
+                    'author': author[:200],
+                    'year': ref_data['year'],
+                }
+    return None
+
+
+_YEAR_RE = re.compile(r'\b(19|20)\d{2}\b')
+
 
 def _update_paper_metadata(paper: Paper) -> None:
-    """Update paper metadata after processing."""
+    """Mark a paper's processing metadata as completed."""
     try:
-        metadata, created = PaperMetadata.objects.get_or_create(paper=paper)
-        
-        # Update processing status
-        metadata.processing_status = 'completed'
-        metadata.save()
-        
-        # Update paper year if not set
-        if not paper.year:
-            # Try to extract year from title or content
-            year_match = re.search(r'\b(19|20)\d{2}\b', paper.title)
-            if year_match:
-                paper.year = int(year_match.group(0))
-                paper.save()
+        # A single UPDATE once the row exists; it is only created the first
+        # time a paper is processed. update() skips auto_now, so set it here.
+        updated = PaperMetadata.objects.filter(paper=paper).update(
+            processing_status='completed',
+            last_processed=timezone.now()
+        )
+        if not updated:
+            PaperMetadata.objects.update_or_create(
+                paper=paper,
+                defaults={'processing_status': 'completed'}
+            )
         
-    except Exception as e:
-        print(f"Error updating paper metadata: {e}")
+    except Exception:
+        logger.exception("Error updating metadata for paper %s", paper.id)
 
 
 def build_reference_graph(paper: Paper, max_depth: int = 3) -> Dict:
-    """Build a reference graph starting from a given paper."""
-    def _build_graph_recursive(current_paper: Paper, depth: int, visited: set) -> Dict:
-        if depth > max_depth or str(current_paper.id) in visited:
-            return None
-        
-        visited.add(str(current_paper.id))
-        
-        node = {
+    """Build a reference graph starting from a given paper.
+
+    The graph is walked breadth-first with one query per level, and each
+    paper appears once, at the shallowest depth it is reached from.
+    """
+    def _node(current_paper: Paper, depth: int) -> Dict:
+        return {
             'id': str(current_paper.id),
             'title': current_paper.title,
             'author': current_paper.author,
             'year': current_paper.year,
-            'depth': depth
+            'depth': depth,
+            'references': [],
         }
+    
+    root = _node(paper, 0)
+    nodes = {paper.id: root}
+    frontier = [paper.id]
+    
+    for depth in range(1, max_depth + 1):
+        if not frontier:
+            break
+        # Fetch every reference of the current level, with its target, at once,
+        # reading only the columns the nodes use
+        level_refs = Reference.objects.filter(
+            source_paper_id__in=frontier
+        ).select_related('target_paper').only(
+            'source_paper_id',
+            'target_paper__id',
+            'target_paper__title',
+            'target_paper__author',
+            'target_paper__year',
+        )
         
-        # Get references
-        references = []
-        for ref in current_paper.references.all():
-            ref_node = _build_graph_recursive(ref.target_paper, depth + 1, visited)
-            if ref_node:
-                references.append(ref_node)
-        
-        node['references'] = references
-        return node
+        next_frontier = []
+        for ref in level_refs:
+            target = ref.target_paper
+            if target.id in nodes:
+                continue
+            node = _node(target, depth)
+            nodes[target.id] = node
+            nodes[ref.source_paper_id]['references'].append(node)
+            next_frontier.append(target.id)
+        frontier = next_frontier
+    
+    return root
+
+
+# Seconds a built graph payload is kept. Changes to papers or references move
+# the graph to a new version, so this only bounds how long old versions linger.
+GRAPH_CACHE_TIMEOUT = 60 * 60
+
+_GRAPH_VERSION_KEY = 'graph-version'
+
+
+def _graph_cache_shared() -> bool:
+    """Whether the default cache is visible to every process, workers included."""
+    # Workers write references, so a per-process cache would never see their bumps
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def graph_cache_version() -> Optional[int]:
+    """Return the current version of the reference graph, for cache keys.
+
+    Returns None when the cache is process-local, so callers don't cache.
+    """
+    if not _graph_cache_shared():
+        return None
+    # Seeded from the clock, so a version lost to eviction never reuses old keys
+    return cache.get_or_set(_GRAPH_VERSION_KEY, time.time_ns, None)
+
+
+def bump_graph_version() -> None:
+    """Mark cached graph payloads stale after papers or references change."""
+    try:
+        cache.incr(_GRAPH_VERSION_KEY)
+    except ValueError:
+        # Not set yet; the next read seeds a fresh version
+        pass
+
+
+# Characters replaced in node labels, mapped in a single pass
+_LABEL_TRANSLATION = str.maketrans({'\n': ' ', '\r': ' ', '\u25fe': '•'})
+
+
+def _graph_label(title: str) -> str:
+    """Return a short, single-line node label for a paper title."""
+    label = title[:50] + '...' if len(title) > 50 else title
+    return label.translate(_LABEL_TRANSLATION).strip()
+
+
+def build_graph_data() -> Dict:
+    """Build the nodes and edges of the whole reference graph for vis.js.
+
+    Ids are left as UUIDs; orjson writes them as their canonical strings.
+    """
+    # Two queries, read as plain rows without building model instances and
+    # streamed in chunks rather than loaded into a result cache first
+    nodes = [
+        {
+            'id': paper_id,
+            'label': _graph_label(title),
+            'title': title,
+            'author': author or 'Unknown Author',
+            'group': 'paper',
+            'size': 20 + (citation_count * 2)  # Size based on citations
+        }
+        for paper_id, title, author, citation_count in Paper.objects.values_list(
+            'id', 'title', 'author', 'citation_count'
+        ).iterator(chunk_size=2000)
+    ]
     
-    visited = set()
-    return _build_graph_recursive(paper, 0, visited)
+    # Add reference edges
+    edges = [
+        {
+            'from': source_id,
+            'to': target_id,
+            'arrows': 'to',
+            'label': 'references',
+            'width': 2
+        }
+        for source_id, target_id in Reference.objects.values_list(
+            'source_paper_id', 'target_paper_id'
+        ).iterator(chunk_size=2000)
+    ]
+    
+    return {
+        'nodes': nodes,
+        'edges': edges
+    }
+
+
+def get_graph_payload(rebuild: bool = False) -> bytes:
+    """Return the whole reference graph as encoded JSON.
+
+    The encoded payload is cached per graph version, so it is only rebuilt
+    after papers or references change, or when rebuild is set. It is built
+    fresh every time when the cache is process-local.
+    """
+    version = graph_cache_version()
+    if version is None:
+        return orjson.dumps(build_graph_data())
+    key = f'graph-data:{version}'
+    content = None if rebuild else cache.get(key)
+    if content is None:
+        content = orjson.dumps(build_graph_data())
+        cache.set(key, content, GRAPH_CACHE_TIMEOUT)
+    return content
+
+
+# Seconds a computed statistics summary is reused; dashboards poll it
+PAPER_STATISTICS_TIMEOUT = 300
 
 
 def get_paper_statistics() -> Dict:
     """Get statistics about papers and references."""
     try:
-        total_papers = Paper.objects.count()
-        processed_papers = Paper.objects.filter(processed=True).count()
-        total_references = Reference.objects.count()
-        
-        # Papers with most references
-        top_referenced = Paper.objects.annotate(
-            ref_count=models.Count('references')
-        ).order_by('-ref_count')[:10]
-        
-        # Papers with most citations
-        top_cited = Paper.objects.annotate(
-            citation_count=models.Count('cited_by')
-        ).order_by('-citation_count')[:10]
+        return cache.get_or_set('paper-statistics', _compute_paper_statistics, PAPER_STATISTICS_TIMEOUT)
         
-        return {
-            'total_papers': total_papers,
-            'processed_papers': processed_papers,
-            'total_references': total_references,
-            'top_referenced': [
-                {'title': p.title, 'author': p.author, 'count': p.ref_count}
-                for p in top_referenced
-            ],
-            'top_cited': [
-                {'title': p.title, 'author': p.author, 'count': p.citation_count}
-                for p in top_cited
-            ]
-        }
-        
-    except Exception as e:
-        print(f"Error getting paper statistics: {e}")
+    except Exception:
+        logger.exception("Error getting paper statistics")
         return {}
 
 
+def _compute_paper_statistics() -> Dict:
+    paper_totals = Paper.objects.aggregate(
+        total=models.Count('id'),
+        processed=models.Count('id', filter=models.Q(processed=True)),
+    )
+    total_references = Reference.objects.count()
+    
+    # Papers with most references and most citations, read from the indexed
+    # count columns instead of aggregating the whole reference table, as
+    # plain dicts in the shape returned below
+    top_referenced = Paper.objects.order_by('-reference_count').values(
+        'title', 'author', count=models.F('reference_count')
+    )[:10]
+    top_cited = Paper.objects.order_by('-citation_count').values(
+        'title', 'author', count=models.F('citation_count')
+    )[:10]
+    
+    return {
+        'total_papers': paper_totals['total'],
+        'processed_papers': paper_totals['processed'],
+        'total_references': total_references,
+        'top_referenced': list(top_referenced),
+        'top_cited': list(top_cited)
+    }
+
+
 def search_papers_by_reference(query: str) -> List[Paper]:
     """Search papers by their reference content."""
     try:
-        # Search in reference text
-        references = Reference.objects.filter(
+        # Search in reference text, reading just the ids at both ends
+        matches = Reference.objects.filter(
             reference_text__icontains=query
-        )
+        ).values_list('source_paper_id', 'target_paper_id')
         
-        # Get unique papers
-        papers = set()
-        for ref in references:
-            papers.add(ref.source_paper)
-            papers.add(ref.target_paper)
+        # Get unique papers, loaded together in one query without their text
+        paper_ids = set()
+        for source_id, target_id in matches.iterator(chunk_size=2000):
+            paper_ids.add(source_id)
+            paper_ids.add(target_id)
         
-        return list(papers)
+        papers = Paper.objects.only('id', 'title', 'author', 'year')
+        return list(papers.in_bulk(paper_ids).values())
         
-    except Exception as e:
-        print(f"Error searching papers by reference: {e}")
+    except Exception:
+        logger.exception("Error searching papers by reference")
         return []
 
 
@@ -335,11 +708,99 @@ def search_papers_by_reference(query: str) -> List[Paper]:
 # Online fetching helpers
 # ----------------------------
 
+# Same limit PaperUploadSerializer enforces for uploaded files
+MAX_PDF_BYTES = 50 * 1024 * 1024
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    # API lookups identify themselves; publisher pages still get a browser UA per request
+    session.headers.update({'User-Agent': 'papers-bot/1.0'})
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+            respect_retry_after_header=True,
+        ),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Shared across calls and threads so lookups to the same hosts (CrossRef,
+# Unpaywall, arXiv, doi.org) reuse pooled keep-alive connections.
+_SESSION = _build_session()
+
+
+def get_session() -> requests.Session:
+    """Return the shared HTTP session used for online lookups."""
+    return _SESSION
+
+
+def _cached_api_get(url: str, params: Optional[Dict] = None, timeout: int = 15) -> Optional[bytes]:
+    """GET an external API, reusing response bodies through Django's cache.
+
+    Many papers cite the same works, so the same CrossRef, Unpaywall and arXiv
+    queries recur across a batch. Only 200 responses are stored; any other
+    status returns None and request errors propagate, so failures are retried
+    next time rather than remembered.
+    """
+    # Sort params so the same query always maps to the same key
+    params = sorted((params or {}).items())
+    key = 'external-api:' + hashlib.sha256(orjson.dumps([url, params])).hexdigest()
+    content = cache.get(key)
+    if content is None:
+        r = get_session().get(url, params=params, timeout=timeout)
+        if r.status_code != 200:
+            return None
+        content = r.content
+        cache.set(key, content, settings.EXTERNAL_API_CACHE_TIMEOUT)
+    return content
+
+
+# Fetches currently running in this process, keyed by paper id
+_INFLIGHT: Dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
 def ensure_paper_content_via_online_sources(paper_id: str) -> bool:
     """If the paper has no content/file, try to fetch an online PDF and process it.
 
+    Concurrent calls for the same paper share a single fetch: later callers
+    wait for the first one's result instead of downloading again.
+
     Returns True if content was obtained and processed; otherwise False.
     """
+    key = str(paper_id)
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _INFLIGHT[key] = future
+
+    if not is_owner:
+        return future.result()
+
+    try:
+        result = _ensure_paper_content(key)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+
+
+def _ensure_paper_content(paper_id: str) -> bool:
     try:
         paper = Paper.objects.get(id=paper_id)
     except Paper.DoesNotExist:
@@ -349,7 +810,7 @@ def ensure_paper_content_via_online_sources(paper_id: str) -> bool:
     if paper.content_text or (paper.file and paper.file.name):
         # If we have a file but not processed, process it
         if not paper.processed:
-            rag = RAGEngine()
+            rag = get_rag_engine()
             ok = rag.process_paper(paper)
             if ok and paper.content_text:
                 # Extract references once content exists
@@ -361,28 +822,34 @@ def ensure_paper_content_via_online_sources(paper_id: str) -> bool:
     downloaded = False
     # Prefer DOI if available, otherwise try to discover via CrossRef by title/author
     doi = (paper.doi or '').strip()
-    if not doi:
-        doi = _discover_doi_via_crossref(paper.title, paper.author, paper.year) or ''
-        if doi:
-            paper.doi = doi
-            paper.save(update_fields=['doi'])
-
-    if doi:
-        pdf_url = _find_pdf_from_doi(doi)
-        if pdf_url:
-            downloaded = _download_pdf_to_paper(paper, pdf_url)
-
-    # If still no file, try arXiv by title
-    if not downloaded:
-        arxiv_pdf = _find_arxiv_pdf_by_title(paper.title)
-        if arxiv_pdf:
-            downloaded = _download_pdf_to_paper(paper, arxiv_pdf)
+
+    def _lookup_via_doi():
+        found = doi or _discover_doi_via_crossref(paper.title, paper.author, paper.year) or ''
+        return found, (_find_pdf_from_doi(found) if found else None)
+
+    # The DOI chain and the arXiv title search are independent network
+    # lookups, so run them side by side instead of waiting on each in turn
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        doi_future = executor.submit(_lookup_via_doi)
+        arxiv_future = executor.submit(_find_arxiv_pdf_by_title, paper.title)
+        found_doi, doi_pdf = doi_future.result()
+        arxiv_pdf = arxiv_future.result()
+
+    if found_doi and not doi:
+        paper.doi = found_doi
+        paper.save(update_fields=['doi'])
+
+    # Download once, preferring the DOI source and falling back to arXiv
+    for pdf_url in (doi_pdf, arxiv_pdf):
+        if pdf_url and _download_pdf_to_paper(paper, pdf_url):
+            downloaded = True
+            break
 
     if not downloaded:
         return False
 
     # Process the newly downloaded file
-    rag = RAGEngine()
+    rag = get_rag_engine()
     ok = rag.process_paper(paper)
     if ok and paper.content_text:
         extract_references_from_paper(str(paper.id))
@@ -392,15 +859,16 @@ def ensure_paper_content_via_online_sources(paper_id: str) -> bool:
 def _discover_doi_via_crossref(title: str, author: Optional[str], year: Optional[int]) -> Optional[str]:
     try:
         url = "https://api.crossref.org/works"
-        query = title or ''
+        # Field-specific queries score better than one free-text string, and
+        # select trims each item down to the DOI we actually read
+        params = {"query.bibliographic": title or '', "rows": 1, "select": "DOI"}
         if author:
-            query += f" {author}"
-        params = {"query": query, "rows": 1}
+            params["query.author"] = author
         if year:
             params["filter"] = f"from-pub-date:{year}-01-01,until-pub-date:{year}-12-31"
-        r = requests.get(url, params=params, timeout=15)
-        if r.status_code == 200:
-            items = r.json().get('message', {}).get('items', [])
+        content = _cached_api_get(url, params=params)
+        if content:
+            items = orjson.loads(content).get('message', {}).get('items', [])
             if items:
                 return items[0].get('DOI')
         return None
@@ -409,35 +877,33 @@ def _discover_doi_via_crossref(title: str, author: Optional[str], year: Optional
 
 
 def _find_pdf_from_doi(doi: str) -> Optional[str]:
-    # Try Unpaywall first if configured
-    email = os.getenv('UNPAYWALL_EMAIL') or getattr(settings, 'UNPAYWALL_EMAIL', None)
-    if email:
-        try:
-            url = f"https://api.unpaywall.org/v2/{urllib.parse.quote(doi)}"
-            r = requests.get(url, params={"email": email}, timeout=15)
-            if r.status_code == 200:
-                data = r.json()
-                best = data.get('best_oa_location') or {}
-                pdf_url = best.get('url_for_pdf') or best.get('url')
-                if pdf_url and pdf_url.lower().endswith('.pdf'):
-                    return pdf_url
-        except Exception:
-            pass
-
-    # Try CrossRef 'link' entries
+    # DOIs are case-insensitive; normalise so cached lookups are reused
     try:
-        cr = requests.get(f"https://api.crossref.org/works/{urllib.parse.quote(doi)}", timeout=15)
-        if cr.status_code == 200:
-            item = cr.json().get('message', {})
-            for link in item.get('link', []) or []:
-                if link.get('content-type') == 'application/pdf' and link.get('URL'):
-                    return link['URL']
-    except Exception:
-        pass
+        return _search_pdf_for_doi(doi.strip().lower())
+    except LookupError:
+        return None
+
+
+@functools.lru_cache(maxsize=2048)
+def _search_pdf_for_doi(doi: str) -> str:
+    """Find a PDF URL for a DOI.
+
+    Only found URLs are memoised per process. A miss raises LookupError,
+    which lru_cache does not store, so a lookup that hit a transient error
+    is retried next time; the API responses behind it are cached separately.
+    """
+    # Unpaywall and CrossRef 'link' entries are independent lookups, so ask
+    # both at once; Unpaywall's answer is preferred when both have one
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        unpaywall_future = executor.submit(_find_pdf_via_unpaywall, doi)
+        crossref_future = executor.submit(_find_pdf_via_crossref_links, doi)
+        pdf = unpaywall_future.result() or crossref_future.result()
+    if pdf:
+        return pdf
 
     # Fallback: scrape DOI landing page for a PDF link
     try:
-        landing = requests.get(
+        landing = get_session().get(
             f"https://doi.org/{urllib.parse.quote(doi)}",
             timeout=15,
             allow_redirects=True,
@@ -450,12 +916,48 @@ def _find_pdf_from_doi(doi: str) -> Optional[str]:
     except Exception:
         pass
 
+    raise LookupError(f"No PDF found for DOI {doi}")
+
+
+def _find_pdf_via_unpaywall(doi: str) -> Optional[str]:
+    # Only available when an Unpaywall contact email is configured
+    email = os.getenv('UNPAYWALL_EMAIL') or getattr(settings, 'UNPAYWALL_EMAIL', None)
+    if not email:
+        return None
+    try:
+        url = f"https://api.unpaywall.org/v2/{urllib.parse.quote(doi)}"
+        content = _cached_api_get(url, params={"email": email})
+        if content:
+            data = orjson.loads(content)
+            best = data.get('best_oa_location') or {}
+            pdf_url = best.get('url_for_pdf') or best.get('url')
+            if pdf_url and pdf_url.lower().endswith('.pdf'):
+                return pdf_url
+    except Exception:
+        pass
     return None
 
 
+def _find_pdf_via_crossref_links(doi: str) -> Optional[str]:
+    try:
+        content = _cached_api_get(f"https://api.crossref.org/works/{urllib.parse.quote(doi)}")
+        if content:
+            item = orjson.loads(content).get('message', {})
+            for link in item.get('link', []) or []:
+                if link.get('content-type') == 'application/pdf' and link.get('URL'):
+                    return link['URL']
+    except Exception:
+        pass
+    return None
+
+
+_PDF_LINK_TAGS = SoupStrainer(['meta', 'a'])
+
+
 def _extract_pdf_url_from_html(html: str, base_url: str) -> Optional[str]:
     try:
-        soup = BeautifulSoup(html, 'html.parser')
+        # Only <meta> and <a> tags matter here, so skip building the rest of the tree
+        soup = BeautifulSoup(html, 'html.parser', parse_only=_PDF_LINK_TAGS)
         # Common meta tag used by many publishers
         meta = soup.find('meta', attrs={'name': 'citation_pdf_url'})
         if meta and meta.get('content'):
@@ -474,33 +976,123 @@ def _find_arxiv_pdf_by_title(title: Optional[str]) -> Optional[str]:
     if not title:
         return None
     try:
-        q = title.strip()
-        url = "http://export.arxiv.org/api/query"
-        r = requests.get(url, params={"search_query": f"ti:{q}", "max_results": 1}, timeout=15)
-        if r.status_code == 200 and '<entry>' in r.text:
-            # Extract id url and convert to pdf url
-            id_match = re.search(r'<id>(.*?)</id>', r.text)
-            if id_match:
-                abs_url = id_match.group(1)
-                if 'arxiv.org/abs/' in abs_url:
-                    return abs_url.replace('/abs/', '/pdf/') + '.pdf'
-        return None
+        # Normalise so the same title spelled with different spacing/case shares a cache entry
+        return _search_arxiv_pdf(' '.join(title.lower().split()))
     except Exception:
         return None
 
 
+@functools.lru_cache(maxsize=2048)
+def _search_arxiv_pdf(query: str) -> str:
+    """Look up an arXiv PDF URL by title.
+
+    Only found URLs are memoised per process. A miss raises LookupError and a
+    failed request raises HTTPError, neither of which lru_cache stores; the
+    API response behind a miss is cached separately, with a TTL.
+    """
+    url = "http://export.arxiv.org/api/query"
+    content = _cached_api_get(url, params={"search_query": f"ti:{query}", "max_results": 1})
+    if content is None:
+        raise requests.HTTPError(f"arXiv query failed for {query!r}")
+    entry = _parse_arxiv_first_entry(content)
+    if entry is None:
+        raise LookupError(f"No arXiv entry for {query!r}")
+    # Prefer the feed's explicit PDF link, falling back to the entry id
+    for link in entry.iterfind('atom:link', _ATOM_NS):
+        if link.get('title') == 'pdf' and link.get('href'):
+            return link.get('href')
+    abs_url = (entry.findtext('atom:id', default='', namespaces=_ATOM_NS) or '').strip()
+    if 'arxiv.org/abs/' in abs_url:
+        return abs_url.replace('/abs/', '/pdf/') + '.pdf'
+    raise LookupError(f"No arXiv PDF link for {query!r}")
+
+
+_ATOM_NS = {'atom': 'http://www.w3.org/2005/Atom'}
+
+
+def _parse_arxiv_first_entry(content: bytes) -> Optional[ET.Element]:
+    """Return the first <entry> of an arXiv API Atom response, if any."""
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError:
+        return None
+    return root.find('atom:entry', _ATOM_NS)
+
+
+_UNSAFE_FILENAME_RE = re.compile(r'[^a-zA-Z0-9_-]+')
+
+
 def _download_pdf_to_paper(paper: Paper, pdf_url: str) -> bool:
+    upload = None
     try:
-        r = requests.get(pdf_url, timeout=30, stream=True, headers={"User-Agent": "Mozilla/5.0"})
-        if r.status_code != 200:
-            return False
-        content_type = r.headers.get('Content-Type', '')
-        if 'pdf' not in content_type and not pdf_url.lower().endswith('.pdf'):
-            return False
-        content = r.content
-        safe_title = re.sub(r'[^a-zA-Z0-9_-]+', '_', (paper.title or 'paper'))[:50]
+        with get_session().get(pdf_url, timeout=30, stream=True, headers={"User-Agent": "Mozilla/5.0"}) as r:
+            if r.status_code != 200:
+                return False
+            # Headers arrive before the body, so these checks cost no download
+            content_type = r.headers.get('Content-Type', '').lower()
+            if 'html' in content_type:
+                # Login walls and landing pages behind links ending in .pdf
+                return False
+            if 'pdf' not in content_type and not pdf_url.lower().endswith('.pdf'):
+                return False
+            # Reject oversize files before reading the body
+            if int(r.headers.get('Content-Length') or 0) > MAX_PDF_BYTES:
+                return False
+            chunks = r.iter_content(chunk_size=64 * 1024)
+            # Servers mislabel HTML as PDF, so check the magic bytes before
+            # writing anything; readers accept the header within the first 1 KB
+            head = b''
+            for chunk in chunks:
+                head += chunk
+                if len(head) >= 1024:
+                    break
+            if b'%PDF-' not in head[:1024]:
+                return False
+            # Stream to disk in chunks rather than holding the whole PDF in memory,
+            # hashing as we go so identical PDFs can be recognised. A temporary
+            # upload file lets FileSystemStorage move it into place instead of
+            # copying it a second time.
+            hasher = hashlib.blake2b(digest_size=32)
+            upload = TemporaryUploadedFile('download.pdf', 'application/pdf', 0, None)
+            hasher.update(head)
+            upload.write(head)
+            for chunk in chunks:
+                hasher.update(chunk)
+                upload.write(chunk)
+                # Content-Length can be missing or wrong, so enforce the cap on what arrives
+                if upload.tell() > MAX_PDF_BYTES:
+                    return False
+            upload.size = upload.tell()
+        paper.content_hash = hasher.hexdigest()
+        
+        # The same PDF is often reachable from several references; point this
+        # paper at the stored copy (and its extracted text) instead of saving another
+        existing = (
+            Paper.objects.filter(content_hash=paper.content_hash)
+            .exclude(file='')
+            .exclude(pk=paper.pk)
+            .values('file', 'content_text')
+            .first()
+        )
+        if existing:
+            paper.file.name = existing['file']
+            update_fields = ['file', 'content_hash']
+            if existing['content_text'] and not paper.content_text:
+                paper.content_text = existing['content_text']
+                update_fields.append('content_text')
+            paper.save(update_fields=update_fields)
+            return True
+        
+        safe_title = _UNSAFE_FILENAME_RE.sub('_', (paper.title or 'paper'))[:50]
         filename = f"{safe_title}_{int(time.time())}.pdf"
-        paper.file.save(filename, ContentFile(content), save=True)
+        upload.seek(0)
+        paper.file.save(filename, upload, save=False)
+        # Write just the changed columns rather than re-saving every field
+        paper.save(update_fields=['file', 'content_hash'])
         return True
     except Exception:
         return False
+    finally:
+        if upload is not None:
+            # Removes the temporary file unless storage already moved it
+            upload.close()
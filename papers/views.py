@@ -1,12 +1,18 @@
 """
 API views for the papers app.
 """
+import logging
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
+from django.db import DatabaseError, transaction
 from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
 from .models import Paper, Reference, PaperChunk
 from .serializers import (
     PaperSerializer, 
@@ -14,16 +20,20 @@ from .serializers import (
     PaperChunkSerializer,
     PaperUploadSerializer
 )
-from .utils import extract_references_from_paper
+from .tasks import process_and_extract_references
+from .utils import extract_references_from_paper, get_graph_payload, graph_cache_version
+
+logger = logging.getLogger(__name__)
 
 
 class PaperListView(generics.ListAPIView):
     """List all papers with optional filtering."""
-    queryset = Paper.objects.all()
+    queryset = Paper.objects.defer('content_text')
     serializer_class = PaperSerializer
     
     def get_queryset(self):
-        queryset = Paper.objects.all()
+        # PaperSerializer never exposes content_text, so don't load it
+        queryset = Paper.objects.defer('content_text')
         search = self.request.query_params.get('search', None)
         if search:
             queryset = queryset.filter(
@@ -36,7 +46,7 @@ class PaperListView(generics.ListAPIView):
 
 class PaperDetailView(generics.RetrieveAPIView):
     """Retrieve a specific paper."""
-    queryset = Paper.objects.all()
+    queryset = Paper.objects.defer('content_text')
     serializer_class = PaperSerializer
 
 
@@ -45,8 +55,12 @@ class PaperReferencesView(generics.ListAPIView):
     serializer_class = ReferenceSerializer
     
     def get_queryset(self):
-        paper = get_object_or_404(Paper, pk=self.kwargs['pk'])
-        return paper.references.all()
+        paper = get_object_or_404(Paper.objects.only('id'), pk=self.kwargs['pk'])
+        # Both ends are serialized in full, so join them in rather than
+        # fetching two papers per reference
+        return paper.references.select_related('source_paper', 'target_paper').defer(
+            'source_paper__content_text', 'target_paper__content_text'
+        )
 
 
 class PaperCitedByView(generics.ListAPIView):
@@ -54,9 +68,10 @@ class PaperCitedByView(generics.ListAPIView):
     serializer_class = PaperSerializer
     
     def get_queryset(self):
-        paper = get_object_or_404(Paper, pk=self.kwargs['pk'])
-        # Return the papers that cite this paper (source_paper from references)
-        return Paper.objects.filter(references__target_paper=paper)
+        paper = get_object_or_404(Paper.objects.only('id'), pk=self.kwargs['pk'])
+        # Return the papers that cite this paper (source_paper from references);
+        # a paper cites another at most once, so the join yields no duplicates
+        return Paper.objects.filter(references__target_paper=paper).defer('content_text')
 
 
 class PaperChunksView(generics.ListAPIView):
@@ -65,7 +80,7 @@ class PaperChunksView(generics.ListAPIView):
     
     def get_queryset(self):
         paper = get_object_or_404(Paper, pk=self.kwargs['pk'])
-        return paper.chunks.all()
+        return paper.chunks.defer('embedding')
 
 
 class PaperUploadView(generics.CreateAPIView):
@@ -75,8 +90,10 @@ class PaperUploadView(generics.CreateAPIView):
     
     def perform_create(self, serializer):
         paper = serializer.save()
-        # Extract references synchronously (no recursion on upload)
-        extract_references_from_paper(str(paper.id))
+        # Text and reference extraction run on the workers, so the upload
+        # returns straight away; queue only once the paper row is committed
+        paper_id = str(paper.id)
+        transaction.on_commit(lambda: process_and_extract_references(paper_id))
 
 
 class PaperSearchView(generics.ListAPIView):
@@ -94,7 +111,17 @@ class PaperSearchView(generics.ListAPIView):
             Q(author__icontains=query) |
             Q(abstract__icontains=query) |
             Q(content_text__icontains=query)
-        )
+        ).defer('content_text')
+
+
+def _graph_etag(request):
+    """Tag graph responses with the graph's current cache version.
+
+    Untagged when the cache is process-local, since the version there can't
+    see changes made by the workers.
+    """
+    version = graph_cache_version()
+    return None if version is None else f'graph-{version}'
 
 
 class GraphDataView(generics.GenericAPIView):
@@ -102,58 +129,35 @@ class GraphDataView(generics.GenericAPIView):
     
     def get(self, request):
         try:
-            papers = Paper.objects.all()
-            nodes = []
-            edges = []
-            
-            for paper in papers:
-                try:
-                    # Create a safe label by truncating and cleaning the title
-                    safe_title = paper.title[:50] + '...' if len(paper.title) > 50 else paper.title
-                    safe_title = safe_title.replace('\n', ' ').replace('\r', ' ').replace('\u25fe', '•').strip()
-                    
-                    nodes.append({
-                        'id': str(paper.id),
-                        'label': safe_title,
-                        'title': paper.title,
-                        'author': paper.author or 'Unknown Author',
-                        'group': 'paper',
-                        'size': 20 + (paper.citation_count * 2)  # Size based on citations
-                    })
-                    
-                    # Add reference edges
-                    for ref in paper.references.all():
-                        edges.append({
-                            'from': str(paper.id),
-                            'to': str(ref.target_paper.id),
-                            'arrows': 'to',
-                            'label': 'references',
-                            'width': 2
-                        })
-                except Exception as e:
-                    print(f"Error processing paper {paper.id}: {e}")
-                    continue
-            
-            return Response({
-                'nodes': nodes,
-                'edges': edges
-            })
-        except Exception as e:
-            print(f"Error in GraphDataView: {e}")
-            return Response({
-                'error': str(e),
+            return self._graph_response(request)
+        except DatabaseError:
+            raise
+        except Exception:
+            logger.exception("Error in GraphDataView")
+            # Untagged and never stored, so no cache keeps serving the error
+            response = Response({
+                'error': 'Error building graph data',
                 'nodes': [],
                 'edges': []
             }, status=500)
+            response['Cache-Control'] = 'no-store'
+            return response
+    
+    # Browsers and proxies may keep the payload but must revalidate it; an
+    # unchanged graph version answers with a bodyless 304
+    @method_decorator(cache_control(public=True, no_cache=True))
+    @method_decorator(etag(_graph_etag))
+    def _graph_response(self, request):
+        # Already-encoded JSON, so it bypasses the renderer
+        return HttpResponse(get_graph_payload(), content_type='application/json')
 
 
 @api_view(['POST'])
 def process_paper_references(request, pk):
     """Manually trigger reference extraction for a paper."""
     try:
-        print(f"Processing references for paper: {pk}")
         paper = get_object_or_404(Paper, pk=pk)
-        print(f"Found paper: {paper.title}")
+        logger.debug("Processing references for paper %s", pk)
         
         # Check if paper has content
         if not paper.content_text and not paper.file:
@@ -165,19 +169,23 @@ def process_paper_references(request, pk):
         success = extract_references_from_paper(str(paper.id))
 
         if success:
-            # Refresh paper to get updated reference count
-            paper.refresh_from_db()
+            # Extraction refreshes the stored count, so read just that column
+            references_found = Paper.objects.filter(pk=paper.pk).values_list(
+                'reference_count', flat=True
+            ).get()
             return Response({
                 'message': 'Reference extraction completed successfully',
-                'references_found': paper.references.count()
+                'references_found': references_found
             }, status=status.HTTP_200_OK)
         else:
             return Response({
                 'error': 'Reference extraction failed'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-    except Exception as e:
-        print(f"Error in process_paper_references: {e}")
+    except DatabaseError:
+        raise
+    except Exception:
+        logger.exception("Error processing references for paper %s", pk)
         return Response({
-            'error': f'Error processing references: {str(e)}'
+            'error': 'Error processing references'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
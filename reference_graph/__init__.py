@@ -1,3 +1,4 @@
+# Load the Celery app with Django so shared tasks use the project configuration.
+from .celery import app as celery_app
 
-
-
+__all__ = ('celery_app',)
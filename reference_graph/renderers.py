@@ -0,0 +1,35 @@
+"""
+orjson-backed renderer and parser for Django REST framework.
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Falls back to DRF's encoder for types orjson does not handle natively (Decimal, lazy strings, ...)
+_fallback_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Render API responses as JSON using orjson."""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_fallback_encoder.default)
+
+
+class ORJSONParser(BaseParser):
+    """Parse JSON request bodies using orjson."""
+    media_type = 'application/json'
+    
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Compresses responses for clients that accept it; the graph JSON shrinks ~6x
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -118,6 +120,15 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'reference_graph.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'reference_graph.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # CORS settings
@@ -142,6 +153,36 @@ CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:63
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+# Per-paper tasks are long and uneven, so workers take one at a time from their own queue
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ROUTES = {
+    'papers.tasks.process_paper_rag': {'queue': 'papers'},
+    'papers.tasks.extract_references_task': {'queue': 'papers'},
+    # Outbound fetches get their own rate-limited lane so slow hosts don't starve processing
+    'papers.tasks.fetch_paper_content_task': {'queue': 'downloads'},
+}
+
+# Cache: shared by the web processes and the Celery workers, so versions bumped
+# by worker-side writes reach the web process. Defaults to the Redis instance
+# Celery already needs; CACHE_URL=locmem:// opts into per-process memory for
+# single-process development, which disables graph caching
+CACHE_URL = os.getenv('CACHE_URL', CELERY_BROKER_URL)
+if CACHE_URL.startswith('locmem://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+
+# Seconds to reuse CrossRef, Unpaywall and arXiv API responses
+EXTERNAL_API_CACHE_TIMEOUT = int(os.getenv('EXTERNAL_API_CACHE_TIMEOUT', 7 * 24 * 60 * 60))
 
 # Logging
 LOGGING = {
@@ -160,6 +201,11 @@ LOGGING = {
         'handlers': ['console', 'file'],
         'level': 'INFO',
     },
+    # Per-paper processing logs; set APP_LOG_LEVEL=WARNING to silence them
+    'loggers': {
+        'papers': {'level': os.getenv('APP_LOG_LEVEL', 'INFO')},
+        'chatbot': {'level': os.getenv('APP_LOG_LEVEL', 'INFO')},
+    },
 }
 
 # Unpaywall configuration (optional, improves PDF discovery)
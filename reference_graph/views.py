@@ -1,28 +1,36 @@
 """
 Main views for the reference_graph project.
 """
+import logging
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
+from django.core.cache import cache
 from papers.models import Paper
-from papers.utils import extract_references_from_paper, ensure_paper_content_via_online_sources
+from papers.tasks import fetch_paper_content_task, process_and_extract_references
 import json
 
+logger = logging.getLogger(__name__)
+
+# Seconds the home page reuses its paper count
+PAPER_COUNT_TIMEOUT = 60
+
 
 def home(request):
     """Home page view."""
-    papers = Paper.objects.all()[:10]  # Show recent papers
+    papers = Paper.objects.defer('content_text')[:10]  # Show recent papers
     context = {
         'papers': papers,
-        'total_papers': Paper.objects.count(),
+        # Workers add placeholder papers too, so this may lag by up to a minute
+        'total_papers': cache.get_or_set('paper-count', Paper.objects.count, PAPER_COUNT_TIMEOUT),
     }
     return render(request, 'home.html', context)
 
 
 def reference_graph(request):
     """Reference graph visualization view."""
-    papers = Paper.objects.all()
+    papers = Paper.objects.defer('content_text')
     context = {
         'papers': papers,
     }
@@ -32,13 +40,15 @@ def reference_graph(request):
 def paper_detail(request, paper_id):
     """Paper detail view with zoom functionality and chatbot."""
     paper = get_object_or_404(Paper, id=paper_id)
-    # If no content, try to fetch from online sources and process
+    # If no content, queue a background fetch from online sources; the page
+    # renders straight away and shows the content once the worker is done
     if not paper.content_text and not (paper.file and paper.file.name):
-        try:
-            ensure_paper_content_via_online_sources(str(paper.id))
-            paper.refresh_from_db()
-        except Exception:
-            pass
+        # Only queue one fetch per paper every few minutes, however often the page is viewed
+        if cache.add(f'paper-online-fetch:{paper.id}', True, timeout=600):
+            try:
+                fetch_paper_content_task.delay(str(paper.id))
+            except Exception:
+                logger.exception("Could not queue online fetch for paper %s", paper.id)
     references = paper.references.all()
     cited_by = paper.cited_by.all()
     
@@ -68,8 +78,11 @@ def upload_paper(request):
                     file=uploaded_file
                 )
                 
-                # Extract references synchronously
-                extract_references_from_paper(str(paper.id))
+                # Text and reference extraction run on the workers, so the
+                # upload returns straight away; queue only once the paper row
+                # is committed
+                paper_id = str(paper.id)
+                transaction.on_commit(lambda: process_and_extract_references(paper_id))
                 
                 messages.success(request, 'Paper uploaded successfully! Processing references...')
                 return redirect('paper_detail', paper_id=paper.id)
@@ -82,53 +95,6 @@ def upload_paper(request):
     return render(request, 'upload_paper.html')
 
 
-def get_graph_data(request):
-    """API endpoint to get graph data for visualization."""
-    try:
-        papers = Paper.objects.all()
-        nodes = []
-        edges = []
-        
-        for paper in papers:
-            try:
-                # Create a safe label by truncating and cleaning the title
-                safe_title = paper.title[:50] + '...' if len(paper.title) > 50 else paper.title
-                safe_title = safe_title.replace('\n', ' ').replace('\r', ' ').replace('\u25fe', '•').strip()
-                
-                nodes.append({
-                    'id': str(paper.id),
-                    'label': safe_title,
-                    'title': paper.title,
-                    'author': paper.author or 'Unknown Author',
-                    'group': 'paper',
-                    'size': 20 + (paper.citation_count * 2)  # Size based on citations
-                })
-                
-                # Add reference edges
-                for ref in paper.references.all():
-                    edges.append({
-                        'from': str(paper.id),
-                        'to': str(ref.target_paper.id),
-                        'arrows': 'to',
-                        'label': 'references'
-                    })
-            except Exception as e:
-                print(f"Error processing paper {paper.id}: {e}")
-                continue
-        
-        return JsonResponse({
-            'nodes': nodes,
-            'edges': edges
-        })
-    except Exception as e:
-        print(f"Error in get_graph_data: {e}")
-        return JsonResponse({
-            'error': str(e),
-            'nodes': [],
-            'edges': []
-        }, status=500)
-
-
 def test_graph(request):
     """Test page for graph visualization."""
     return render(request, 'test_graph.html')
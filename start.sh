@@ -85,7 +85,7 @@ sleep 3
 
 # Start Celery worker
 echo "🔧 Starting Celery worker..."
-celery -A reference_graph worker --loglevel=info &
+celery -A reference_graph worker -Q celery,papers,downloads --loglevel=info &
 CELERY_PID=$!
 
 # Start Celery beat (optional)